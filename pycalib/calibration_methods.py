@@ -302,7 +302,7 @@ class TemperatureScaling(CalibrationMethod):
 
         # Save plot to file
         pycalib.texfig.savefig(filename)
-        plt.close()
+        plt.close(fig)
 
 
 class PlattScaling(CalibrationMethod):
@@ -1169,7 +1169,7 @@ class GPCalibration(CalibrationMethod):
 
         # Save plot to file
         pycalib.texfig.savefig(filename)
-        plt.close()
+        plt.close(fig)
 
 
 class OneVsRestCalibrator(sklearn.base.BaseEstimator):
@@ -2,15 +2,67 @@
 
 # Standard imports
 import numpy as np
-import scipy.stats
-
-# matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.offsetbox import AnchoredText
 
 # Package imports
 import pycalib.scoring
-import pycalib.texfig as texfig
+
+
+def _argmax_and_max(p_pred):
+    """
+    Compute the predicted label and its confidence in a single pass over the confidence estimates.
+
+    Parameters
+    ----------
+    p_pred : array, shape = [..., n_samples, n_classes]
+        Array of confidence estimates.
+
+    Returns
+    -------
+    y_pred : array, shape = [..., n_samples]
+        Predicted labels.
+    p_max : array, shape = [..., n_samples]
+        Confidence in the predicted labels.
+
+    Notes
+    -----
+    For the top-1 prediction alone, argmax followed by a gather is optimal. Should the top-k confidences be needed as
+    well, e.g. for margin-based statistics, a single :func:`numpy.argpartition` pass over the last axis yields both
+    and should replace this function.
+    """
+    p_pred = np.asarray(p_pred)
+    y_pred = np.argmax(p_pred, axis=-1)
+    p_max = np.take_along_axis(p_pred, y_pred[..., np.newaxis], axis=-1)[..., 0]
+    return y_pred, p_max
+
+
+def _stacked_predictions(p_pred):
+    """
+    Compute predicted labels and their confidence for one or multiple arrays of confidence estimates.
+
+    Parameters
+    ----------
+    p_pred : array or list
+        Array of confidence estimates of shape [n_samples, n_classes] or [n_methods, n_samples, n_classes], or a list
+        of arrays of shape [n_samples, n_classes].
+
+    Returns
+    -------
+    y_pred : array, shape = [n_methods, n_samples]
+        Predicted labels, with `n_methods` = 1 for a single array of shape [n_samples, n_classes].
+    p_max : array, shape = [n_methods, n_samples]
+        Confidence in the predicted labels.
+    n_classes : int
+        Number of classes.
+    """
+    if isinstance(p_pred, list):
+        p_pred = [np.asarray(p) for p in p_pred]
+        y_pred, p_max = map(np.stack, zip(*[_argmax_and_max(p) for p in p_pred]))
+        return y_pred, p_max, p_pred[0].shape[-1]
+
+    p_pred = np.asarray(p_pred)
+    n_methods = p_pred.shape[0] if p_pred.ndim == 3 else 1
+    y_pred, p_max = _argmax_and_max(p_pred.reshape((n_methods,) + p_pred.shape[-2:]))
+    return y_pred, p_max, p_pred.shape[-1]
 
 
 def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins=100, show_ece=False, show_legend=False,
@@ -23,13 +75,11 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
 
     Parameters
     ----------
-    y : array, shape = [n_methods, n_samples]
-        Ground truth labels.
-    y_pred : array, shape = [n_methods, n_samples]
-        Predicted labels.
+    y : array, shape = [n_samples]
+        Ground truth labels, shared by all reliability diagrams.
     p_pred : array or list
-        Array of confidence estimates. If this is a list, multiple reliability diagrams will be plotted and arranged
-        side-by-side.
+        Array of confidence estimates. If this is a list or an array of shape [n_methods, n_samples, n_classes],
+        multiple reliability diagrams will be plotted and arranged side-by-side.
     filename : str
         Path or name of output plot files.
     title : str or list
@@ -43,7 +93,7 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
     model_name : str
         Name of the model from which the probabilities were generated. Displayed when showing the legend.
     xlim : array, shape = (2,), default=None
-        X-axis limits. If note provided inferred from y.
+        X-axis limits. If not provided inferred from the number of columns of `p_pred`.
 
     References
     ----------
@@ -53,18 +103,39 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
            the 22nd International Conference on Machine Learning (2005)
 
     """
+    # Matplotlib is imported on first use only, since its initialization is slow
+    import matplotlib.pyplot as plt
+    from matplotlib.offsetbox import AnchoredText
+    import pycalib.texfig as texfig
+
     # Initialization
+    y = np.asarray(y)
+
+    # Find predictions and confidence of all reliability diagrams
+    y_pred, p_max, n_classes = _stacked_predictions(p_pred)
+    n_plots = y_pred.shape[0]
+    correct = np.equal(y_pred, y).astype(np.uint8)
+
+    # Confidence in the predicted label is at least 1 / n_classes
     if xlim is None:
-        n_classes = len(np.unique(y))
         xlim = [1 / n_classes, 1]
 
-    # Check whether multiple reliability diagrams should be plotted
-    n_plots = 1
-    if isinstance(p_pred, list):
-        n_plots = len(p_pred)
-
     # Define bins
     bins = np.linspace(xlim[0], xlim[1], n_bins + 1)
+    bin_means = 0.5 * (bins[:-1] + bins[1:])
+    bin_edges_fill = np.repeat(bins, 2)[1:-1]
+
+    # Compute empirical accuracy of all reliability diagrams at once
+    counts, sums = pycalib.scoring.binned_counts(p_max, correct, bin_range=xlim, n_bins=n_bins)
+    empirical_acc = np.where(counts > 0, sums / np.maximum(counts, 1), bin_means)
+
+    # Bin the ECE over [1 / n_classes, 1], reusing the diagram's bins if they coincide
+    if show_ece:
+        ece_range = [1 / n_classes, 1]
+        if np.array_equal(ece_range, xlim):
+            ece_counts, ece_sums = counts, sums
+        else:
+            ece_counts, ece_sums = pycalib.scoring.binned_counts(p_max, correct, bin_range=ece_range, n_bins=n_bins)
 
     # Plot reliability diagram
     fig, axes = texfig.subplots(nrows=2, ncols=n_plots, width=plot_width, ratio=plot_height/plot_width,
@@ -74,31 +145,16 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
     for i in range(n_plots):
         if n_plots > 1:
             current_plot_axes = axes[:, i]
-            y_pred = np.argmax(p_pred[i], axis=1)
-            p_max = np.max(p_pred[i], axis=1)
-            p_pred_current = p_pred[i]
         else:
             current_plot_axes = axes
-            y_pred = np.argmax(p_pred, axis=1)
-            p_max = np.max(p_pred, axis=1)
-            p_pred_current = p_pred
 
         # Calibration line
         current_plot_axes[0].plot(xlim, xlim, linestyle='--', color='grey')
 
-        # Compute bin means and empirical accuracy
-        bin_means = np.linspace(xlim[0] + xlim[1] / (2 * n_bins), xlim[1] - xlim[1] / (2 * n_bins), n_bins)
-        empirical_acc = scipy.stats.binned_statistic(p_max,
-                                                     np.equal(y_pred, y).astype(int),
-                                                     bins=n_bins,
-                                                     range=xlim)[0]
-        empirical_acc[np.isnan(empirical_acc)] = bin_means[np.isnan(empirical_acc)]
-
         # Plot accuracy
-        current_plot_axes[0].step(bins, np.concatenate(([xlim[0]], empirical_acc)), '-', label=model_name)
-        x = np.linspace(xlim[0], xlim[1], 1000)
-        bin_ind = np.digitize(x, bins)[1:-1] - 1
-        current_plot_axes[0].fill_between(x[1:-1], x[1:-1], (bin_means + (empirical_acc - bin_means))[bin_ind], facecolor='k', alpha=0.2)
+        current_plot_axes[0].step(bins, np.concatenate(([xlim[0]], empirical_acc[i])), '-', label=model_name)
+        current_plot_axes[0].fill_between(bin_edges_fill, bin_edges_fill, np.repeat(empirical_acc[i], 2), facecolor='k',
+                                          alpha=0.2)
         if i == 0:
             current_plot_axes[0].set_ylabel('accuracy')
         if show_legend:
@@ -109,8 +165,7 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
             current_plot_axes[0].set_title(title)
 
         # Plot histogram
-        hist, ex = np.histogram(p_max, bins=bins)
-        current_plot_axes[1].fill_between(bins, np.concatenate(([0], hist / np.sum(hist))), lw=0.0, step="pre")
+        current_plot_axes[1].fill_between(bins, np.concatenate(([0], counts[i] / np.sum(counts[i]))), lw=0.0, step="pre")
         current_plot_axes[1].set_xlabel('confidence $\\hat{\\textnormal{z}}$')
         if i == 0:
             current_plot_axes[1].set_ylabel('sample frac.')
@@ -119,7 +174,8 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
 
         # Add textbox with ECE
         if show_ece:
-            ece = pycalib.scoring.expected_calibration_error(y=y, p_pred=p_pred_current, n_bins=n_bins)
+            ece = pycalib.scoring.binned_calibration_error(ece_counts[i], ece_sums[i], bin_range=ece_range,
+                                                           n_bins=n_bins)
             anchored_text = AnchoredText("$\\textup{ECE}_1 = " + "{:.3f}$".format(ece), loc='lower right')
             anchored_text.patch.set_boxstyle("round,pad=0.,rounding_size=0.2")
             anchored_text.patch.set_edgecolor("0.8")
@@ -128,4 +184,4 @@ def reliability_diagram(y, p_pred, filename, title="Reliability Diagram", n_bins
 
     # Save to file
     texfig.savefig(filename=filename, bbox_inches='tight', pad_inches=0)
-    plt.close()
\ No newline at end of file
+    plt.close(fig)
\ No newline at end of file
@@ -4,9 +4,7 @@ import time
 
 import numpy as np
 import copy
-import matplotlib.pyplot as plt
 
-import scipy.stats
 import sklearn.metrics
 import sklearn.utils.validation
 
@@ -65,6 +63,91 @@ def odds_correctness(y, p_pred):
     return accuracy(y=y, p_pred=p_pred) / error(y=y, p_pred=p_pred)
 
 
+def binned_counts(p_max, correct, bin_range, n_bins):
+    """
+    Bin confidence estimates into equal-width bins and count correct predictions per bin.
+
+    Samples with confidence outside of `bin_range` are discarded. A single pass with :func:`numpy.bincount` replaces
+    separate calls to :func:`scipy.stats.binned_statistic` and :func:`numpy.histogram`. Leading dimensions of `p_max`
+    are binned independently of each other, but still with a single call to :func:`numpy.bincount`.
+
+    Parameters
+    ----------
+    p_max : array, shape = [..., n_samples]
+        Confidence in the predicted label.
+    correct : array, shape = [..., n_samples]
+        Whether each prediction is correct, as a boolean or `uint8` array.
+    bin_range : array, shape = (2,)
+        Range of the bins.
+    n_bins : int
+        Number of bins.
+
+    Returns
+    -------
+    counts : array, shape = [..., n_bins]
+        Number of samples in each bin.
+    sums : array, shape = [..., n_bins]
+        Number of correct predictions in each bin.
+    """
+    out_shape = np.shape(p_max)[:-1] + (n_bins,)
+    p_max = np.reshape(p_max, (-1, np.shape(p_max)[-1]))
+    correct = np.reshape(correct, p_max.shape)
+    n_sets = p_max.shape[0]
+
+    bins = np.linspace(bin_range[0], bin_range[1], n_bins + 1)
+    in_range = (p_max >= bins[0]) & (p_max <= bins[-1])
+    offsets = np.broadcast_to(np.arange(n_sets)[:, np.newaxis] * n_bins, p_max.shape)[in_range]
+    p_max = p_max[in_range]
+    idx = np.clip(((p_max - bins[0]) * (n_bins / (bins[-1] - bins[0]))).astype(np.intp), 0, n_bins - 1)
+
+    # Correct for rounding errors at the bin edges
+    idx[p_max < bins[idx]] -= 1
+    idx[(p_max >= bins[idx + 1]) & (idx != n_bins - 1)] += 1
+
+    idx += offsets
+    counts = np.bincount(idx, minlength=n_sets * n_bins).reshape(out_shape)
+    sums = np.bincount(idx, weights=correct[in_range], minlength=n_sets * n_bins).reshape(out_shape)
+    return counts, sums
+
+
+def binned_calibration_error(counts, sums, bin_range, n_bins, p=1):
+    """
+    Computes the expected calibration error ECE_p from binned confidence estimates.
+
+    Parameters
+    ----------
+    counts : array, shape = [n_bins]
+        Number of samples in each bin as returned by :func:`binned_counts`.
+    sums : array, shape = [n_bins]
+        Number of correct predictions in each bin as returned by :func:`binned_counts`.
+    bin_range : array, shape = (2,)
+        Range of the bins.
+    n_bins : int
+        Number of bins.
+    p : int, default=1
+        Power of the calibration error, :math:`1 \\leq p \\leq \\infty`.
+
+    Returns
+    -------
+    float
+        Expected calibration error
+    """
+    nonempty = counts > 0
+    empirical_acc = sums[nonempty] / counts[nonempty]
+
+    # Perfect calibration
+    calibrated_acc = np.linspace(bin_range[0] + bin_range[1] / (2 * n_bins), bin_range[1] - bin_range[1] / (2 * n_bins),
+                                 n_bins)[nonempty]
+
+    # Expected calibration error
+    if p < np.inf:
+        ece = np.average(abs(empirical_acc - calibrated_acc) ** p, weights=counts[nonempty])
+    elif np.isinf(p):
+        ece = np.max(abs(empirical_acc - calibrated_acc))
+
+    return ece
+
+
 def expected_calibration_error(y, p_pred, n_bins=100, n_classes=None, p=1):
     """
     Computes the expected calibration error ECE_p.
@@ -97,31 +180,14 @@ def expected_calibration_error(y, p_pred, n_bins=100, n_classes=None, p=1):
     if n_classes is None:
         n_classes = np.unique(np.concatenate([y, y_pred])).shape[0]
 
-    # Compute bin means
-    bin_range = [1 / n_classes, 1]
-    bins = np.linspace(bin_range[0], bin_range[1], n_bins + 1)
-
     # Find prediction confidence
     p_max = np.max(p_pred, axis=1)
 
-    # Compute empirical accuracy
-    empirical_acc = scipy.stats.binned_statistic(p_max, (y_pred == y).astype(int),
-                                                 bins=n_bins, range=bin_range)[0]
-    nanindices = np.where(np.logical_not(np.isnan(empirical_acc)))[0]
-
-    # Perfect calibration
-    calibrated_acc = np.linspace(bin_range[0] + bin_range[1] / (2 * n_bins), bin_range[1] - bin_range[1] / (2 * n_bins),
-                                 n_bins)
-
-    # Expected calibration error
-    weights_ece = np.histogram(p_max, bins)[0][nanindices]
-    if p < np.inf:
-        ece = np.average(abs(empirical_acc[nanindices] - calibrated_acc[nanindices]) ** p,
-                         weights=weights_ece)
-    elif np.isinf(p):
-        ece = np.max(abs(empirical_acc[nanindices] - calibrated_acc[nanindices]))
+    # Compute bin counts and empirical accuracy
+    bin_range = [1 / n_classes, 1]
+    counts, sums = binned_counts(p_max, (y_pred == y).astype(np.uint8), bin_range=bin_range, n_bins=n_bins)
 
-    return ece
+    return binned_calibration_error(counts, sums, bin_range=bin_range, n_bins=n_bins, p=p)
 
 
 def sharpness(y, p_pred, ddof=1):
@@ -157,6 +223,30 @@ def sharpness(y, p_pred, ddof=1):
     return sharp
 
 
+def _pred_correct_and_confidence(y, p_pred):
+    """
+    Find correct predictions and the confidence in the predicted labels with a single pass over `p_pred`.
+
+    Parameters
+    ----------
+    y : array-like
+        Ground truth labels
+    p_pred : array-like
+        Array of confidence estimates
+
+    Returns
+    -------
+    pred_correct : array, shape = [n_samples]
+        Whether each prediction is correct.
+    p_max : array, shape = [n_samples]
+        Confidence in the predicted labels.
+    """
+    p_pred = np.asarray(p_pred)
+    y_pred = np.argmax(p_pred, axis=1)
+    p_max = np.take_along_axis(p_pred, y_pred[:, np.newaxis], axis=1)[:, 0]
+    return np.equal(y, y_pred), p_max
+
+
 def overconfidence(y, p_pred):
     """
     Computes the overconfidence of a classifier.
@@ -176,11 +266,10 @@ def overconfidence(y, p_pred):
     float
         Overconfidence
     """
-    # Find prediction and confidence
-    y_pred = np.argmax(p_pred, axis=1)
-    p_max = np.max(p_pred, axis=1)
+    # Find correct predictions and confidence
+    pred_correct, p_max = _pred_correct_and_confidence(y, p_pred)
 
-    return np.average(p_max[y_pred != y])
+    return np.average(p_max[~pred_correct])
 
 
 def underconfidence(y, p_pred):
@@ -202,11 +291,10 @@ def underconfidence(y, p_pred):
     float
         Underconfidence
     """
-    # Find prediction and confidence
-    y_pred = np.argmax(p_pred, axis=1)
-    p_max = np.max(p_pred, axis=1)
+    # Find correct predictions and confidence
+    pred_correct, p_max = _pred_correct_and_confidence(y, p_pred)
 
-    return np.average(1 - p_max[y_pred == y])
+    return np.average(1 - p_max[pred_correct])
 
 
 def ratio_over_underconfidence(y, p_pred):
@@ -227,7 +315,10 @@ def ratio_over_underconfidence(y, p_pred):
     float
         Ratio of over- and underconfidence
     """
-    return overconfidence(y=y, p_pred=p_pred) / underconfidence(y = y, p_pred=p_pred)
+    # Find correct predictions and confidence
+    pred_correct, p_max = _pred_correct_and_confidence(y, p_pred)
+
+    return np.average(p_max[~pred_correct]) / np.average(1 - p_max[pred_correct])
 
 
 def average_confidence(y, p_pred):
@@ -265,11 +356,15 @@ def weighted_abs_conf_difference(y, p_pred):
     weighted_abs_diff: float
         Accuracy weighted absolute difference between over and underconfidence.
     """
-    y_pred = np.argmax(p_pred, axis=1)
-    of = overconfidence(y, p_pred)
-    uf = underconfidence(y, p_pred)
+    # Find correct predictions and confidence
+    pred_correct, p_max = _pred_correct_and_confidence(y, p_pred)
+
+    # Over- and underconfidence
+    acc = np.average(pred_correct)
+    of = np.average(p_max[~pred_correct])
+    uf = np.average(1 - p_max[pred_correct])
 
-    return abs((1 - np.average(y == y_pred)) * of - np.average(y == y_pred) * uf)
+    return abs((1 - acc) * of - acc * uf)
 
 
 def brier_score(y, p_pred):
@@ -409,7 +504,10 @@ class MultiScorer:
             kwargs_copy = copy.deepcopy(kwargs)
             kwargs_copy["filename"] = kwargs.get("filename", "") + "_" + str(self.n_folds)
             plot_fun(y=y, p_pred=p_pred, **kwargs_copy)
-        plt.close("all")
+        if self.plots:
+            # Matplotlib is imported on first use only, since its initialization is slow
+            import matplotlib.pyplot as plt
+            plt.close("all")
 
         # Set evaluation to true
         self._called = True
@@ -0,0 +1,38 @@
+# Standard imports
+import pytest
+import numpy as np
+
+# Package imports
+import pycalib.plotting as plot
+import pycalib.scoring as sc
+
+
+@pytest.fixture(scope='module')
+def y_p_pred_methods(n_methods=3, sample_size=1000, n_classes=4):
+    # Labels and rounded confidence estimates of several methods
+    rng = np.random.RandomState(0)
+    p_pred = np.round(rng.dirichlet(alpha=np.ones(n_classes), size=(n_methods, sample_size)), 2)
+    y = rng.randint(0, n_classes, size=sample_size)
+    return y, p_pred
+
+
+def test_stacked_predictions_array_equals_list(y_p_pred_methods, n_bins=15):
+    # An array of shape [n_methods, n_samples, n_classes] is binned like the equivalent list
+    y, p_pred = y_p_pred_methods
+    y_pred_arr, p_max_arr, n_classes_arr = plot._stacked_predictions(p_pred)
+    y_pred_list, p_max_list, n_classes_list = plot._stacked_predictions(list(p_pred))
+    assert n_classes_arr == n_classes_list == p_pred.shape[-1], "Number of classes differs."
+
+    bin_range = [1 / n_classes_arr, 1]
+    counts_arr, sums_arr = sc.binned_counts(p_max_arr, np.equal(y_pred_arr, y), bin_range=bin_range, n_bins=n_bins)
+    counts_list, sums_list = sc.binned_counts(p_max_list, np.equal(y_pred_list, y), bin_range=bin_range,
+                                              n_bins=n_bins)
+    assert np.array_equal(counts_arr, counts_list) and np.array_equal(sums_arr, sums_list), \
+        "Bins of array and list input differ."
+
+    # Batched bins agree with binning each method separately
+    for i in range(p_pred.shape[0]):
+        counts, sums = sc.binned_counts(np.max(p_pred[i], axis=1), np.argmax(p_pred[i], axis=1) == y,
+                                        bin_range=bin_range, n_bins=n_bins)
+        assert np.array_equal(counts_arr[i], counts) and np.array_equal(sums_arr[i], sums), \
+            "Batched bins differ from bins of a single method."
@@ -0,0 +1,67 @@
+# Standard imports
+import pytest
+import numpy as np
+import scipy.stats
+
+# Package imports
+import pycalib.scoring as sc
+
+
+# General
+@pytest.fixture(scope='module')
+def n_classes():
+    return 5
+
+
+@pytest.fixture(scope='module')
+def y_p_pred(n_classes, sample_size=2000):
+    # Confidence estimates and labels agreeing with the prediction 70% of the time
+    rng = np.random.RandomState(42)
+    p_pred = rng.dirichlet(alpha=np.ones(n_classes) * .5, size=sample_size)
+    y = np.where(rng.uniform(size=sample_size) < .7, np.argmax(p_pred, axis=1),
+                 rng.randint(0, n_classes, size=sample_size))
+    return y, p_pred
+
+
+def ece_reference(y, p_pred, n_bins, n_classes, p):
+    # Binned ECE computed with scipy.stats.binned_statistic and np.histogram
+    y_pred = np.argmax(p_pred, axis=1)
+    p_max = np.max(p_pred, axis=1)
+    bin_range = [1 / n_classes, 1]
+    empirical_acc = scipy.stats.binned_statistic(p_max, (y_pred == y).astype(int), bins=n_bins, range=bin_range)[0]
+    nonempty = np.logical_not(np.isnan(empirical_acc))
+    calibrated_acc = np.linspace(bin_range[0] + bin_range[1] / (2 * n_bins), bin_range[1] - bin_range[1] / (2 * n_bins),
+                                 n_bins)
+    weights = np.histogram(p_max, np.linspace(bin_range[0], bin_range[1], n_bins + 1))[0]
+    if np.isinf(p):
+        return np.max(abs(empirical_acc[nonempty] - calibrated_acc[nonempty]))
+    return np.average(abs(empirical_acc[nonempty] - calibrated_acc[nonempty]) ** p, weights=weights[nonempty])
+
+
+# Expected calibration error
+
+@pytest.mark.parametrize("p", [1, 2, np.inf])
+@pytest.mark.parametrize("n_bins", [10, 15, 100])
+@pytest.mark.parametrize("decimals", [None, 1, 2])
+def test_ece_reference(y_p_pred, n_classes, p, n_bins, decimals):
+    # Rounded confidence estimates lie on bin edges
+    y, p_pred = y_p_pred
+    if decimals is not None:
+        p_pred = np.round(p_pred, decimals)
+    ece = sc.expected_calibration_error(y=y, p_pred=p_pred, n_bins=n_bins, n_classes=n_classes, p=p)
+    assert ece == pytest.approx(ece_reference(y, p_pred, n_bins=n_bins, n_classes=n_classes, p=p)), \
+        "ECE does not match the binned reference implementation."
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_binned_counts_bin_edges(dtype, n_bins=20, bin_range=(.2, 1.)):
+    # Confidence estimates exactly on all bin edges and just outside of the range
+    bins = np.linspace(bin_range[0], bin_range[1], n_bins + 1)
+    p_max = np.concatenate([bins, np.round(np.linspace(0, 1, 101), 2), [bin_range[0] - 1e-3]]).astype(dtype)
+    correct = (np.arange(len(p_max)) % 3 == 0).astype(np.uint8)
+
+    counts, sums = sc.binned_counts(p_max, correct, bin_range=bin_range, n_bins=n_bins)
+    assert np.array_equal(counts, np.histogram(p_max, bins=bins)[0]), \
+        "Bin counts do not match np.histogram."
+    assert np.array_equal(sums, np.histogram(p_max, bins=bins, weights=correct)[0]), \
+        "Correct predictions per bin do not match np.histogram."